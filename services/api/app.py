@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import os, requests
+import os, random, threading, time, requests
 
 # =========================
 # Config
@@ -11,6 +11,14 @@ MILVUS_HOST = os.environ.get("MILVUS_HOST", "milvus")
 MILVUS_PORT = int(os.environ.get("MILVUS_PORT", "19530"))
 MILVUS_COLLECTION = os.environ.get("MILVUS_COLLECTION", "corpus_rag")
 
+# Cache semántico (SEMANTIC_CACHE_SIZE=0 lo desactiva)
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Fracción de hits que se recalculan para medir divergencia
+SEMANTIC_CACHE_VERIFY_RATE = float(os.environ.get("SEMANTIC_CACHE_VERIFY_RATE", "0.05"))
+# Cada cuántos segundos se revisa si cambió el índice de Solr/Milvus
+SEMANTIC_CACHE_GENERATION_TTL = float(os.environ.get("SEMANTIC_CACHE_GENERATION_TTL", "30"))
+
 app = FastAPI(title="RAG Solr+Milvus API", version="1.1.0")
 
 # CORS para UI local
@@ -106,49 +114,162 @@ def milvus_connect():
         connections.connect("default", host=MILVUS_HOST, port=str(MILVUS_PORT))
 
 
-@app.get("/milvus")
-def milvus_search(q: str = Query(..., min_length=1), k: int = 5):
+def encode_query(q: str):
+    # Normaliza embeddings (igual que en indexación)
+    return get_model().encode([q], normalize_embeddings=True)[0]
+
+
+def milvus_search_vec(emb, k: int) -> list[SearchResponse]:
+    milvus_connect()
+    col = Collection(MILVUS_COLLECTION)
     try:
-        milvus_connect()
-        model = get_model()
-        # Normaliza embeddings (igual que en indexación)
-        emb = model.encode([q], normalize_embeddings=True).tolist()
-
-        col = Collection(MILVUS_COLLECTION)
-        try:
-            col.load()  # idempotente
-        except Exception:
-            pass
-
-        search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
-
-        res = col.search(
-            data=emb,
-            anns_field="embedding",
-            param=search_params,
-            limit=k,
-            output_fields=["parent_id", "text"],
+        col.load()  # idempotente
+    except Exception:
+        pass
+
+    search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
+
+    res = col.search(
+        data=[emb.tolist()],
+        anns_field="embedding",
+        param=search_params,
+        limit=k,
+        output_fields=["parent_id", "text"],
+    )
+
+    out: list[SearchResponse] = []
+    for hit in res[0]:
+        ent = hit.entity
+        txt = ent.get("text")
+        if isinstance(txt, list):
+            txt = txt[0]
+
+        parent = ent.get("parent_id")
+        doc_id = str(parent) if parent is not None else str(hit.id)
+
+        out.append(
+            SearchResponse(
+                source="milvus",
+                id=doc_id,
+                text=txt or "",
+                score=float(hit.distance),
+            )
         )
+    return out
 
-        out: list[SearchResponse] = []
-        for hit in res[0]:
-            ent = hit.entity
-            txt = ent.get("text")
-            if isinstance(txt, list):
-                txt = txt[0]
-
-            parent = ent.get("parent_id")
-            doc_id = str(parent) if parent is not None else str(hit.id)
 
-            out.append(
-                SearchResponse(
-                    source="milvus",
-                    id=doc_id,
-                    text=txt or "",
-                    score=float(hit.distance),
-                )
-            )
+# =========================
+# Cache semántico
+# =========================
+from semantic_cache import SemanticCache
+
+_CACHE: SemanticCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def solr_generation():
+    # show=index: solo metadatos del índice, sin estadísticas por campo
+    r = requests.get(f"{SOLR_URL}/admin/luke", params={"show": "index", "numTerms": 0, "wt": "json"}, timeout=5)
+    r.raise_for_status()
+    return r.json().get("index", {}).get("version")
+
+
+def milvus_generation():
+    milvus_connect()
+    col = Collection(MILVUS_COLLECTION)
+    return [col.describe().get("collection_id"), col.num_entities]
+
+
+def watch_generation(cache: SemanticCache):
+    """
+    Hilo de fondo: cada SEMANTIC_CACHE_GENERATION_TTL segundos consulta la
+    versión de cada backend por separado. Se vacía el cache si alguno de los
+    que respondieron cambió; un backend caído se ignora en esa vuelta.
+    """
+    while True:
+        gen = dict(cache.generation or {})
+        changed = False
+        for name, probe in (("solr", solr_generation), ("milvus", milvus_generation)):
+            try:
+                version = probe()
+            except Exception:
+                continue
+            if name in gen and gen[name] != version:
+                changed = True
+            gen[name] = version
+        if changed:
+            cache.clear(gen)
+        else:
+            cache.generation = gen
+        time.sleep(SEMANTIC_CACHE_GENERATION_TTL)
+
+
+def get_cache() -> SemanticCache | None:
+    global _CACHE
+    if SEMANTIC_CACHE_SIZE <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD)
+            threading.Thread(target=watch_generation, args=(_CACHE,), daemon=True).start()
+    return _CACHE
+
+
+def cached_search(ns: tuple, emb, compute) -> list[SearchResponse]:
+    """
+    Devuelve resultados de una query cacheada parecida o llama a compute().
+    En una fracción de las coincidencias recalcula para medir divergencia y,
+    si el resultado cambió, sirve y guarda el nuevo.
+    """
+    cache = get_cache()
+    if cache is None:
+        return compute()
+
+    epoch, found = cache.lookup(ns, emb)
+    if found is None:
+        out = compute()
+        cache.put(ns, emb, out, epoch)
         return out
+
+    token, cached, _ = found
+    if random.random() < SEMANTIC_CACHE_VERIFY_RATE:
+        fresh = compute()
+        diverged = [(h.source, h.id) for h in fresh] != [(h.source, h.id) for h in cached]
+        cache.record_verification(diverged)
+        if diverged:
+            # El slot guarda el embedding de la query anterior: se descarta
+            # y el resultado nuevo se guarda bajo el embedding de esta query
+            cache.remove(token)
+            cache.put(ns, emb, fresh, epoch)
+        return fresh
+    cache.record_hit()
+    return cached
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.snapshot()}
+
+
+@app.post("/cache/invalidate")
+def cache_invalidate():
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    cache.clear(cache.generation)
+    return {"enabled": True, "invalidated": True}
+
+
+@app.get("/milvus")
+def milvus_search(q: str = Query(..., min_length=1), k: int = 5):
+    try:
+        emb = encode_query(q)
+        return cached_search(("milvus", k), emb, lambda: milvus_search_vec(emb, k))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Milvus error: {e}")
 
@@ -162,12 +283,32 @@ def ask(
     backend: str = Query("both", pattern="^(solr|milvus|both)$"),
     k: int = 5,
 ):
-    results: list[SearchResponse] = []
-    if backend in ("solr", "both"):
-        results += solr_query(query, k)
-    if backend in ("milvus", "both"):
-        results += milvus_search(query, k)
-    return results
+    # Solr-only no usa el cache: evita cargar el modelo y calcular el embedding
+    if backend == "solr" or get_cache() is None:
+        results: list[SearchResponse] = []
+        if backend in ("solr", "both"):
+            results += solr_query(query, k)
+        if backend in ("milvus", "both"):
+            results += milvus_search(query, k)
+        return results
+
+    try:
+        emb = encode_query(query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Embedding error: {e}")
+
+    def compute() -> list[SearchResponse]:
+        results: list[SearchResponse] = []
+        if backend in ("solr", "both"):
+            results += solr_query(query, k)
+        if backend in ("milvus", "both"):
+            try:
+                results += milvus_search_vec(emb, k)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Milvus error: {e}")
+        return results
+
+    return cached_search(("ask", backend, k), emb, compute)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Cache en memoria de resultados por similitud de embeddings.
+
+    Guarda los embeddings (normalizados) de las queries recientes en una
+    matriz fija de `max_size` filas; una query nueva coincide si su
+    similitud coseno con alguna query cacheada del mismo namespace
+    (endpoint, backend, k) supera `threshold`. Desalojo LRU.
+
+    Como los resultados se calculan fuera del lock, `lookup` devuelve un
+    token (slot, seq) y `epoch`; `remove` y `put` no hacen nada si el slot
+    se reutilizó o el cache se vació mientras tanto.
+    """
+
+    def __init__(self, max_size: int = 1024, threshold: float = 0.95):
+        self.max_size = max_size
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vecs = None  # se crea en el primer put, cuando se conoce la dimensión
+        self._ns_map: dict[tuple, int] = {}  # namespace -> id entero
+        self._ns_ids = np.full(max_size, -1, dtype=np.int32)  # -1 = slot libre
+        self._values: list[object] = [None] * max_size
+        self._seqs = [0] * max_size  # 0 = slot libre; nunca se repite un seq
+        self._next_seq = 1
+        self._lru: OrderedDict[int, None] = OrderedDict()  # slot -> None, más reciente al final
+        self._free = list(range(max_size - 1, -1, -1))
+        self.epoch = 0
+        self.generation = None
+        self.stats = {
+            "lookups": 0, "hits": 0, "misses": 0,
+            "verified": 0, "diverged": 0,
+            "evictions": 0, "invalidations": 0,
+        }
+
+    def lookup(self, ns: tuple, vec):
+        """
+        Devuelve (epoch, match); match es (token, valor, similitud) del vecino
+        más cercano o None si no supera el umbral. Quien llama registra si
+        sirvió el valor (`record_hit`) o lo recalculó (`record_verification`).
+        """
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            self.stats["lookups"] += 1
+            ns_id = self._ns_map.get(ns)
+            if self._lru and ns_id is not None:
+                sims = self._vecs @ vec
+                sims[self._ns_ids != ns_id] = -np.inf
+                slot = int(np.argmax(sims))
+                sim = float(sims[slot])
+                if sim >= self.threshold:
+                    self._lru.move_to_end(slot)
+                    return self.epoch, ((slot, self._seqs[slot]), self._values[slot], sim)
+            self.stats["misses"] += 1
+            return self.epoch, None
+
+    def put(self, ns: tuple, vec, value, epoch: int):
+        """
+        Inserta un resultado calculado durante `epoch`; si el cache se vació
+        desde entonces, lo descarta y devuelve None.
+        """
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            if epoch != self.epoch:
+                return None
+            if self._vecs is None:
+                self._vecs = np.zeros((self.max_size, vec.shape[0]), dtype=np.float32)
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._vecs[slot] = vec
+            self._ns_ids[slot] = self._ns_map.setdefault(ns, len(self._ns_map))
+            self._values[slot] = value
+            self._seqs[slot] = self._next_seq
+            self._next_seq += 1
+            self._lru[slot] = None
+            return slot, self._seqs[slot]
+
+    def remove(self, token: tuple[int, int]) -> bool:
+        slot, seq = token
+        with self._lock:
+            if self._seqs[slot] != seq:
+                return False
+            self._ns_ids[slot] = -1
+            self._values[slot] = None
+            self._seqs[slot] = 0
+            del self._lru[slot]
+            self._free.append(slot)
+            return True
+
+    def record_hit(self):
+        with self._lock:
+            self.stats["hits"] += 1
+
+    def record_verification(self, diverged: bool):
+        with self._lock:
+            self.stats["verified"] += 1
+            if diverged:
+                self.stats["diverged"] += 1
+
+    def clear(self, generation=None):
+        with self._lock:
+            self._ns_map.clear()
+            self._ns_ids[:] = -1
+            self._values = [None] * self.max_size
+            self._seqs = [0] * self.max_size
+            self._lru.clear()
+            self._free = list(range(self.max_size - 1, -1, -1))
+            self.epoch += 1
+            self.generation = generation
+            self.stats["invalidations"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            s = dict(self.stats)
+            s["size"] = len(self._lru)
+            s["max_size"] = self.max_size
+            s["threshold"] = self.threshold
+            s["generation"] = self.generation
+        # hit_rate: fracción de lookups servidos desde el cache
+        # (los hits muestreados para verificación se sirven recalculados)
+        s["hit_rate"] = s["hits"] / s["lookups"] if s["lookups"] else 0.0
+        s["divergence_rate"] = s["diverged"] / s["verified"] if s["verified"] else 0.0
+        return s
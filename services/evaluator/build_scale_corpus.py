@@ -0,0 +1,271 @@
+import argparse
+import bisect
+import json
+import random
+import tempfile
+from collections import deque
+from itertools import accumulate
+from pathlib import Path
+
+from build_gold_from_jsonl import shorten_text, N_TOKENS_QUERY, N_TOKENS_GOLD_ANSWER
+
+# Rutas base
+ROOT = Path(__file__).resolve().parents[2]  # .../rag-solr-milvus
+JSONL_IN = ROOT / "data" / "corpus" / "corpus_texto.jsonl"
+CORPUS_OUT = ROOT / "data" / "corpus" / "corpus_escala.jsonl"
+QUERIES_OUT = ROOT / "data" / "queries_gold_escala.jsonl"
+
+# Longitud de documentos (en palabras): log-normal acotada
+LEN_MEDIAN = 300
+LEN_SIGMA = 0.8
+LEN_MIN = 30
+LEN_MAX = 5000
+
+# Cuántos originales recientes se guardan como base para near-duplicates
+DUP_WINDOW = 1000
+
+# Un documento se describe por sus segmentos de procedencia:
+# [(semilla, inicio, largo), ...] en coordenadas de palabras de las semillas.
+
+
+def load_seed_tokens(path: Path) -> list[list[str]]:
+    seeds = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            obj = json.loads(line)
+            txt = obj.get("text") or obj.get("texto_limpio") or ""
+            tokens = str(txt).split()
+            if tokens:
+                seeds.append(tokens)
+    return seeds
+
+
+def sample_length(rng: random.Random, median: int, sigma: float, lo: int, hi: int) -> int:
+    n = int(rng.lognormvariate(0.0, sigma) * median)
+    return max(lo, min(hi, n))
+
+
+def sample_segments(rng: random.Random, seeds: list[list[str]], n_tokens: int,
+                    first_min: int) -> list[tuple[int, int, int]]:
+    """
+    Toma una ventana de n_tokens palabras desde una posición aleatoria
+    de un documento semilla; si no alcanza, sigue con otra semilla.
+    El primer segmento tiene al menos first_min palabras (ahí va la query).
+    """
+    segs: list[tuple[int, int, int]] = []
+    total = 0
+    while total < n_tokens:
+        s = rng.randrange(len(seeds))
+        need = n_tokens - total
+        lo = min(need, first_min) if not segs else 1
+        if len(seeds[s]) < lo:
+            continue
+        start = rng.randrange(len(seeds[s]) - lo + 1)
+        length = min(need, len(seeds[s]) - start)
+        segs.append((s, start, length))
+        total += length
+    return segs
+
+
+def segments_text(seeds: list[list[str]], segs) -> str:
+    return " ".join(" ".join(seeds[s][a:a + n]) for s, a, n in segs)
+
+
+def segments_from_refs(refs: list[tuple[int, int]]) -> list[tuple[int, int, int]]:
+    # Agrupa palabras (semilla, posición) consecutivas en segmentos
+    segs: list[list[int]] = []
+    for s, p in refs:
+        if segs and segs[-1][0] == s and segs[-1][1] + segs[-1][2] == p:
+            segs[-1][2] += 1
+        else:
+            segs.append([s, p, 1])
+    return [tuple(x) for x in segs]
+
+
+def perturb(rng: random.Random, tokens: list, noise: float) -> list:
+    """
+    Near-duplicate: borra, duplica o intercambia una fracción `noise` de palabras.
+    """
+    out = list(tokens)
+    n_edits = max(1, int(len(out) * noise))
+    for _ in range(n_edits):
+        if len(out) < 2:
+            break
+        i = rng.randrange(len(out) - 1)
+        op = rng.random()
+        if op < 1 / 3:
+            del out[i]
+        elif op < 2 / 3:
+            out.insert(i, out[i])
+        else:
+            out[i], out[i + 1] = out[i + 1], out[i]
+    return out
+
+
+def zipf_cum_weights(n: int, s: float) -> list[float]:
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def passage_occurrences(seeds: list[list[str]], passages: set[tuple[str, ...]]):
+    """
+    Todas las posiciones (semilla, inicio, largo) donde aparece literal cada
+    pasaje: el texto de las semillas se repite, así que un mismo pasaje puede
+    venir de varios sitios.
+    """
+    occ: dict[tuple[str, ...], list[tuple[int, int, int]]] = {p: [] for p in passages}
+    for n in {len(p) for p in passages}:
+        for s, tokens in enumerate(seeds):
+            for a in range(len(tokens) - n + 1):
+                key = tuple(tokens[a:a + n])
+                if key in occ:
+                    occ[key].append((s, a, n))
+    return occ
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Expande el corpus semilla a un corpus sintético grande + gold de queries."
+    )
+    ap.add_argument("--input", default=str(JSONL_IN))
+    ap.add_argument("--output", default=str(CORPUS_OUT))
+    ap.add_argument("--queries-output", default=str(QUERIES_OUT))
+    ap.add_argument("--n-docs", type=int, default=100_000)
+    ap.add_argument("--n-queries", type=int, default=10_000)
+    ap.add_argument("--distinct-queries", type=int, default=None,
+                    help="Documentos distintos consultados (por defecto: n-queries // 4).")
+    ap.add_argument("--zipf-s", type=float, default=1.1,
+                    help="Exponente Zipf para la repetición de queries.")
+    ap.add_argument("--len-median", type=int, default=LEN_MEDIAN)
+    ap.add_argument("--len-sigma", type=float, default=LEN_SIGMA)
+    ap.add_argument("--len-min", type=int, default=LEN_MIN)
+    ap.add_argument("--len-max", type=int, default=LEN_MAX)
+    ap.add_argument("--dup-rate", type=float, default=0.1,
+                    help="Fracción de documentos que son near-duplicates de otro.")
+    ap.add_argument("--dup-noise", type=float, default=0.05,
+                    help="Fracción de palabras editadas en cada near-duplicate.")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    if args.n_docs < 1:
+        ap.error("--n-docs debe ser >= 1")
+    if args.n_queries < 0:
+        ap.error("--n-queries debe ser >= 0")
+    if args.distinct_queries is not None and args.distinct_queries < 1:
+        ap.error("--distinct-queries debe ser >= 1")
+
+    in_path = Path(args.input)
+    if not in_path.exists():
+        raise FileNotFoundError(f"No encuentro el JSONL de corpus: {in_path}")
+
+    seeds = load_seed_tokens(in_path)
+    if not seeds:
+        raise ValueError(f"El corpus semilla no tiene textos: {in_path}")
+    first_min = min(N_TOKENS_QUERY, max(len(t) for t in seeds))
+
+    rng = random.Random(args.seed)
+    n_distinct = args.distinct_queries
+    if n_distinct is None:
+        n_distinct = max(1, args.n_queries // 4)
+    n_distinct = min(n_distinct, args.n_docs)
+
+    # Originales recientes (base para near-duplicates) y reservoir de
+    # documentos consultables: {doc_id: (pasaje de la query, gold_answer)}
+    recent: deque[list[tuple[int, int, int]]] = deque(maxlen=DUP_WINDOW)
+    reservoir: list[str] = []
+    targets: dict[str, tuple[tuple[str, ...], str]] = {}
+    n_originals = n_dups = 0
+
+    out_path = Path(args.output)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # 1ª pasada: el corpus se escribe documento a documento, nunca se tiene
+    # entero en memoria; los segmentos de cada documento van a un temporal.
+    meta = tempfile.TemporaryFile("w+", encoding="utf-8")
+    with out_path.open("w", encoding="utf-8") as f_out:
+        for i in range(args.n_docs):
+            doc_id = f"syn_{i:08d}"
+
+            if recent and rng.random() < args.dup_rate:
+                base = rng.choice(recent)
+                refs = [(s, a + j) for s, a, n in base for j in range(n)]
+                segs = segments_from_refs(perturb(rng, refs, args.dup_noise))
+                n_dups += 1
+            else:
+                length = sample_length(rng, args.len_median, args.len_sigma,
+                                       args.len_min, args.len_max)
+                segs = sample_segments(rng, seeds, length, first_min)
+                recent.append(segs)
+                n_originals += 1
+
+                # Reservoir sampling sobre los originales; la query son las
+                # primeras palabras del documento, dentro del primer segmento
+                s, a, n = segs[0]
+                passage = tuple(seeds[s][a:a + min(n, N_TOKENS_QUERY)])
+                entry = (passage,
+                         shorten_text(segments_text(seeds, segs), N_TOKENS_GOLD_ANSWER))
+                if len(reservoir) < n_distinct:
+                    reservoir.append(doc_id)
+                    targets[doc_id] = entry
+                else:
+                    j = rng.randrange(n_originals)
+                    if j < n_distinct:
+                        del targets[reservoir[j]]
+                        reservoir[j] = doc_id
+                        targets[doc_id] = entry
+
+            rec = {"id": doc_id, "text": segments_text(seeds, segs)}
+            f_out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            meta.write(json.dumps([doc_id, segs]) + "\n")
+
+    # 2ª pasada sobre los segmentos: gold_ids = todos los documentos que
+    # contienen literal el pasaje de la query (no solo el que lo originó).
+    # Se ignoran coincidencias que crucen el límite entre dos segmentos.
+    occ = passage_occurrences(seeds, {p for p, _ in targets.values()})
+    by_seed: dict[int, list[tuple[int, int, tuple[str, ...]]]] = {}
+    for passage, places in occ.items():
+        for s, a, n in places:
+            by_seed.setdefault(s, []).append((a, n, passage))
+    for places in by_seed.values():
+        places.sort()
+    starts = {s: [a for a, _, _ in places] for s, places in by_seed.items()}
+
+    gold: dict[tuple[str, ...], list[str]] = {p: [] for p in occ}
+    meta.seek(0)
+    for line in meta:
+        doc_id, segs = json.loads(line)
+        for s, a, n in segs:
+            if s not in by_seed:
+                continue
+            lo = bisect.bisect_left(starts[s], a)
+            hi = bisect.bisect_left(starts[s], a + n)
+            for p, m, passage in by_seed[s][lo:hi]:
+                ids = gold[passage]
+                if p + m <= a + n and (not ids or ids[-1] != doc_id):
+                    ids.append(doc_id)
+    meta.close()
+
+    # Queries: el rango 1 es el documento más consultado (distribución Zipf)
+    rng.shuffle(reservoir)
+    cum_weights = zipf_cum_weights(len(reservoir), args.zipf_s)
+    total = cum_weights[-1]
+
+    q_path = Path(args.queries_output)
+    q_path.parent.mkdir(parents=True, exist_ok=True)
+    with q_path.open("w", encoding="utf-8") as f_q:
+        for qid in range(1, args.n_queries + 1):
+            rank = bisect.bisect_left(cum_weights, rng.random() * total)
+            passage, gold_answer = targets[reservoir[rank]]
+            rec = {
+                "id": qid,
+                "query": " ".join(passage),
+                "gold_ids": gold[passage],
+                "gold_answer": gold_answer,
+            }
+            f_q.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+    print(f"OK -> {args.output} ({args.n_docs} docs: {n_originals} originales, {n_dups} near-duplicates)")
+    print(f"OK -> {args.queries_output} ({args.n_queries} queries sobre {len(reservoir)} documentos)")
+
+
+if __name__ == "__main__":
+    main()
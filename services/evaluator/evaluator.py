@@ -1,5 +1,6 @@
 import json
 import math
+import os
 import time
 from pathlib import Path
 
@@ -15,8 +16,8 @@ from rouge_score import rouge_scorer
 ROOT = Path(__file__).resolve().parents[2]  # .../rag-solr-milvus
 API_URL = "http://localhost:8000/ask"
 
-QUERIES_PATH = ROOT / "data" / "queries_gold.jsonl"
-REPORTS_DIR = ROOT / "reports"
+QUERIES_PATH = Path(os.environ.get("QUERIES_PATH", ROOT / "data" / "queries_gold.jsonl"))
+REPORTS_DIR = Path(os.environ.get("REPORTS_DIR", ROOT / "reports"))
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
 BACKENDS = ["solr", "milvus"]